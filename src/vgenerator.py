@@ -28,13 +28,15 @@
 # This file is invoked by passing a generator parameter `vulkan.v` or `vulkan_video.v`.
 # It produces `src/vulkan.v` or `src/vulkan_video.v`, which then can be copied to your local .vmodules/vulkan directory.
 
+import io
 import re
-import string
+import sys
+from types import MappingProxyType
 
 from generator import (GeneratorOptions,
                        MissingGeneratorOptionsConventionsError,
                        MissingGeneratorOptionsError, MissingRegistryError,
-                       OutputGenerator, noneStr, 
+                       OutputGenerator,
                        write)
 
 class VGeneratorOptions(GeneratorOptions):
@@ -187,13 +189,43 @@ class VOutputGenerator(OutputGenerator):
     # The C code can then be used in REPLACEMENT_MAP
     REPLACEMENT_MAP_FILE_PATH = "../../REPLACEMENT_MAP.txt"
 
+    # License and module declaration at the start of each generated V file. Written at once by beginFile
+    V_FILE_HEADER = """/*
+MIT License
+
+Copyright Anton Oreskin | https://gosudev.de
+
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+*/
+module vulkan
+
+"""
+
     # This is an ordered list of sections in the header file.
     TYPE_SECTIONS = ['include', 'define', 'basetype', 'handle', 'enum',
                      'group', 'bitmask', 'funcpointer', 'struct']
     ALL_SECTIONS = TYPE_SECTIONS + ['commandPointer', 'command']
 
     # These are used to find the base alias in genGroup,
-    BASE_TYPES_ARR = [
+    # Only used for membership tests
+    BASE_TYPES_SET = frozenset((
         'u32',
         'u64',
         'usize', 
@@ -203,22 +235,17 @@ class VOutputGenerator(OutputGenerator):
         'u16', 
         'char', 
         'voidptr'
-    ]
-
-    # Map like '(VkFlags: u32), (VkAccessFlags: u32),
-    # where VkAccessFlags is an alias for VkFlags in C, but V doesn't allow aliasing,
-    # so we just track the base type for each alias.
-    ALIAS_TO_BASE_TYPE_MAP = {}
+    ))
 
     # Used to find things like "dstOffsets[2]" in struct member name
-    ARRAY_REGEX = re.compile(r"\w+(\[\w+\])")
+    ARRAY_REGEX = re.compile(r"\w+(\[\w+\])", re.ASCII)
 
-    # This one from nickl- on stackoverflow also takes care of
+    # v_camel_to_snake_case follows the regex ((?<=[a-z0-9])[A-Z]|(?!^)[A-Z](?=[a-z])) from nickl- on stackoverflow,
+    # which also takes care of
     # - '_' as first character
     # - multiple upper case characters
     # - numbers in names
     # https://stackoverflow.com/questions/1175208/elegant-python-function-to-convert-camelcase-to-snake-case
-    CAMEL_TO_SNAKE_CASE_REGEX = re.compile('((?<=[a-z0-9])[A-Z]|(?!^)[A-Z](?=[a-z]))')
     # PhysicalDeviceVulkan13Features -> physical_device_vulkan1_3_features
     # PhysicalDevice16BitStorageFeatures -> physical_device16bit_storage_features
     # PhysicalDeviceVulkan13Features -> physical_device_vulkan1_3_features
@@ -229,16 +256,25 @@ class VOutputGenerator(OutputGenerator):
     # PhysicalDeviceShaderDemoteToHelperInvocationFeatures -> physical_device_shader_demote_to_helper_invocation_features
     # PhysicalDeviceTextureCompressionASTCHDRFeatures -> physical_device_texture_compression_astc_hdr_features
     
-    # There is an enum StructureType in the vulkan registry.
-    # Also, each struct has a field sType containing this enum.
-    # This array stores enum values and sets a default value for sType, if possible
-    STRUCTURE_TYPES = []
+    # Used to build STRUCTURE_TYPES_WITHOUT_UNDERSCORE
+    DELETE_UNDERSCORE_TABLE = str.maketrans('', '', '_')
     STRUCTURE_TYPES_NUMBER_WITH_UNDERSCORE_REGEX = re.compile('(?<=[A-Z])_(?P<num_after_underscore>[0-9])')
     
-    STD_VIDEO_MAKE_VERSION_REGEX = re.compile(r'#define VK_STD_VULKAN_VIDEO_CODEC(\w+)API_VERSION_(\d+)_(\d+)_(\d+)')
+    STD_VIDEO_MAKE_VERSION_REGEX = re.compile(r'#define VK_STD_VULKAN_VIDEO_CODEC(\w+)API_VERSION_(\d+)_(\d+)_(\d+)', re.ASCII)
+
+    # Strips pointers, arrays and C.Vk from a V type, like '&&C.VkFoo' -> 'Foo'. Used to decide on mut for function parameters
+    PARAM_BASE_TYPE_REGEX = re.compile(r'(?:&|\[\d*\])*(?:C\.Vk)?(.*)', re.ASCII)
 
-    # Array of enum names. To not set mut for enum types in funtion paramters
-    ENUM_TYPES = []
+    # Column width for constant names in buildConstantVDecl
+    CONST_NAME_ALIGN = 33
+    # Characters deleted from constant values like (~0ULL) in buildConstantVDecl and buildEnumVDecl_BitmaskOrDefine
+    CONSTANT_VALUE_STRIP_TABLE = str.maketrans('', '', '~ULF()')
+    # Characters deleted from function pointer parameter names in genVType
+    PARAM_NAME_STRIP_TABLE = str.maketrans('', '', ', );')
+
+    # Used in buildEnumVDecl_Enum to split an enum group name into prefix and suffix for range enum generation
+    ENUM_EXPAND_NAME_REGEX = re.compile(r'([0-9]+|[a-z_])([A-Z0-9])')
+    ENUM_EXPAND_SUFFIX_REGEX = re.compile(r'[A-Z][A-Z]+$')
 
     TYPE_MAP = {
         'size_t': 'usize',
@@ -264,26 +300,13 @@ class VOutputGenerator(OutputGenerator):
         'float64': 'f64',
         'float64*': '&f64',
     }
+    # Keys like 'char* const*' are not interned by the compiler, so intern them all.
+    # Read-only, as it is shared by all generator instances
+    TYPE_MAP = MappingProxyType({sys.intern(k): v for k, v in TYPE_MAP.items()})
 
     REPLACEMENT_MAP = {
         '#if !defined(VK_NO_STDINT_H)\n    #include <stdint.h>\n#endif\n':
         '',
-#        '#define VK_MAKE_VIDEO_STD_VERSION(major, minor, patch) \\\n    ((((uint32_t)(major)) << 22) | (((uint32_t)(minor)) << 12) | ((uint32_t)(patch)))\n':
-#        'pub fn make_video_std_version(major u32, minor u32, patch u32) u32 {\n  return (major << 22) | (minor << 12) | patch\n}\n',
-#        '\n#define VK_STD_VULKAN_VIDEO_CODEC_H264_DECODE_API_VERSION_1_0_0 VK_MAKE_VIDEO_STD_VERSION(1, 0, 0)\n':
-#        'pub const std_vulkan_video_codec_h264_decode_api_version_1_0_0 = make_video_std_version(1, 0, 0)\n', 
-#        '\n#define VK_STD_VULKAN_VIDEO_CODEC_H264_ENCODE_API_VERSION_1_0_0 VK_MAKE_VIDEO_STD_VERSION(1, 0, 0)\n':
-#        'pub const std_vulkan_video_codec_h264_encode_api_version_1_0_0 = make_video_std_version(1, 0, 0)\n', 
-#        '\n#define VK_STD_VULKAN_VIDEO_CODEC_H265_DECODE_API_VERSION_1_0_0 VK_MAKE_VIDEO_STD_VERSION(1, 0, 0)\n':
-#        'pub const std_vulkan_video_codec_h265_decode_api_version_1_0_0 = make_video_std_version(1, 0, 0)\n', 
-#        '\n#define VK_STD_VULKAN_VIDEO_CODEC_H265_ENCODE_API_VERSION_1_0_0 VK_MAKE_VIDEO_STD_VERSION(1, 0, 0)\n':
-#        'pub const std_vulkan_video_codec_h265_encode_api_version_1_0_0 = make_video_std_version(1, 0, 0)\n', 
-#        '\n#define VK_STD_VULKAN_VIDEO_CODEC_AV1_DECODE_API_VERSION_1_0_0 VK_MAKE_VIDEO_STD_VERSION(1, 0, 0)\n':
-#        'pub const std_vulkan_video_codec_av1_decode_api_version_1_0_0 = make_video_std_version(1, 0, 0)\n', 
-#        '\n#define VK_STD_VULKAN_VIDEO_CODEC_AV1_ENCODE_API_VERSION_1_0_0 VK_MAKE_VIDEO_STD_VERSION(1, 0, 0)\n':
-#        'pub const std_vulkan_video_codec_av1_encode_api_version_1_0_0 = make_video_std_version(1, 0, 0)\n', 
-        
-        
         '\n#define VK_DEFINE_HANDLE(object) typedef struct object##_T* object;\n':
         '',
         '\n#ifndef VK_USE_64_BIT_PTR_DEFINES\n    #if defined(__LP64__) || defined(_WIN64) || (defined(__x86_64__) && !defined(__ILP32__) ) || defined(_M_X64) || defined(__ia64) || defined (_M_IA64) || defined(__aarch64__) || defined(__powerpc64__) || (defined(__riscv) && __riscv_xlen == 64)\n        #define VK_USE_64_BIT_PTR_DEFINES 1\n    #else\n        #define VK_USE_64_BIT_PTR_DEFINES 0\n    #endif\n#endif\n':
@@ -301,31 +324,8 @@ class VOutputGenerator(OutputGenerator):
         '',
         '// VK_VERSION_PATCH is deprecated, but no reason was given in the API XML\n// DEPRECATED: This define is deprecated. VK_API_VERSION_PATCH should be used instead.\n#define VK_VERSION_PATCH(version) ((uint32_t)(version) & 0xFFFU)\n':
         '',
-#        '#define VK_MAKE_API_VERSION(variant, major, minor, patch) \\\n    ((((uint32_t)(variant)) << 29U) | (((uint32_t)(major)) << 22U) | (((uint32_t)(minor)) << 12U) | ((uint32_t)(patch)))\n':
-#        'pub fn make_api_version(variant u32, major u32, minor u32, patch u32) u32 {\n  return (variant << 29) | (major << 22) | (minor << 12) | patch\n}\n',
-#
-#        '// Vulkan 1.0 version number\n#define VK_API_VERSION_1_0 VK_MAKE_API_VERSION(0, 1, 0, 0)// Patch version should always be set to 0\n':
-#        'pub const api_version_1_0 = make_api_version(0, 1, 0, 0) // Patch version should always be set to 0',
-#        '// Complete version of this file\n#define VK_HEADER_VERSION_COMPLETE VK_MAKE_API_VERSION(0, 1, 4, VK_HEADER_VERSION)\n':
-#        'pub const header_version_complete = make_api_version(0, 1, 4, header_version)',
-#        '// Complete version of this file\n#define VK_HEADER_VERSION_COMPLETE VK_MAKE_API_VERSION(0, 1, 3, VK_HEADER_VERSION)\n':
-#        'pub const header_version_complete = make_api_version(0, 1, 3, header_version)',
-#        '#define VK_API_VERSION_VARIANT(version) ((uint32_t)(version) >> 29U)':
-#        'pub fn version_variant(version u32) u32 {\n  return version >> 29\n}',
-#        '#define VK_API_VERSION_MAJOR(version) (((uint32_t)(version) >> 22U) & 0x7FU)':
-#        'pub fn api_version_major(version u32) u32 {\n  return (version >> 22) & u32(0x7F)\n}',
-#        '#define VK_API_VERSION_MINOR(version) (((uint32_t)(version) >> 12U) & 0x3FFU)':
-#        'pub fn api_version_minor(version u32) u32 {\n  return (version >> 12) & u32(0x3FF)\n}',
-#        '#define VK_API_VERSION_PATCH(version) ((uint32_t)(version) & 0xFFFU)':
-#        'pub fn api_version_patch(version u32) u32 {\n  return version & u32(0xFFF)\n}',
     }
 
-    # Contains all struct handles in vulkan.
-    # They are pointers to StructName_T and their members are unknown.
-    C_STRUCT_ARR = []
-
-    C_STRUCT_ARR_WITH_VK_PREFIX = []
-
     # Used to find static C code, like #define VK_API_VERSION_MAJOR in appendSection
     # The exact C code is then replaced in genType
     REPLACEMENT_CONTAINS_ARR = [
@@ -352,10 +352,27 @@ class VOutputGenerator(OutputGenerator):
         '#define VK_API_VERSION_MINOR',
         '#define VK_API_VERSION_PATCH',
     ]
+    # All of REPLACEMENT_CONTAINS_ARR as one alternation, so a text is scanned once instead of once per entry.
+    # Most texts match nothing and never reach the per-entry loop.
+    REPLACEMENT_CONTAINS_REGEX = re.compile('|'.join(map(re.escape, REPLACEMENT_CONTAINS_ARR)))
     
-    # The generator fills this ARR with exact C code to write to replacement_map.txt,
-    # which can then be put in REPLACEMENT_MAP above
-    REPLACEMENT_EXACT_TEXT_ARR = []
+    # Wrap V functions needing an extension in $if <extension> ?{ ... } $else { ... }. See makeVDecls
+    # Disabled, so extension functions are always wrapped without conditional compilation
+    EMIT_CONDITIONAL_COMPILATION = False
+
+    # genType converts the type starting with this to 'pub const header_version = 123'.
+    # The version number directly follows it
+    HEADER_VERSION_PREFIX = '// Version of this file\n#define VK_HEADER_VERSION '
+
+    # Comment formats by value of the deprecated attribute. See deprecationComment
+    DEPRECATION_COMMENT_FORMATS = {
+        'aliased': '{padding}// {name} is a deprecated alias\n',
+        'ignored': '{padding}// {name} is deprecated and should not be used\n',
+        'true': '{padding}// {name} is deprecated, but no reason was given in the API XML\n',
+    }
+
+    # Escapes backslashes and new lines of REPLACEMENT_EXACT_TEXTS items in one pass, when writing replacement_map.txt
+    REPLACEMENT_MAP_KEY_ESCAPE_TABLE = str.maketrans({'\\': '\\\\', '\n': '\\n'})
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -363,39 +380,51 @@ class VOutputGenerator(OutputGenerator):
         self.sections = {section: [] for section in self.ALL_SECTIONS}
         self.feature_not_empty = False
         self.may_alias = None
+        # Everything collected from the registry while generating is per generator,
+        # so it doesn't carry over to other generator instances.
+        # Map like '(VkFlags: u32), (VkAccessFlags: u32),
+        # where VkAccessFlags is an alias for VkFlags in C, but V doesn't allow aliasing,
+        # so we just track the base type for each alias.
+        self.ALIAS_TO_BASE_TYPE_MAP = {}
+        # Array of enum names. To not set mut for enum types in funtion paramters
+        self.ENUM_TYPES = []
+        # Contains all struct handles in vulkan.
+        # They are pointers to StructName_T and their members are unknown.
+        # Sets, as these are only used for membership tests
+        self.C_STRUCT_SET = set()
+        self.C_STRUCT_SET_WITH_VK_PREFIX = set()
+        # The generator fills this with exact C code to write to replacement_map.txt,
+        # which can then be put in REPLACEMENT_MAP
+        # Used as an insertion ordered set, so a text matching several entries or generated twice is written once
+        self.REPLACEMENT_EXACT_TEXTS = {}
+        # removeVk results by argument. removeVk is called several times on the same registry names
+        self.REMOVE_VK_CACHE = {}
+        # v_camel_to_snake_case results by argument. Names like pNext and sType are converted for nearly every struct
+        self.SNAKE_CASE_CACHE = {}
+        # There is an enum StructureType in the vulkan registry.
+        # Also, each struct has a field sType containing this enum.
+        # This stores enum values and sets a default value for sType, if possible
+        # Used as an insertion ordered set, only the keys are used
+        self.STRUCTURE_TYPES = {}
+        # STRUCTURE_TYPES names without '_' mapped to the first matching name. Used by find_matching_structure_type_enum
+        self.STRUCTURE_TYPES_WITHOUT_UNDERSCORE = {}
+        # Lazily built map from enum name to its first <enums>/<enum> element. See findEnumElem
+        self.enum_elems_by_name = None
+        # Lazily built map from command name to the extensions requiring it. See getFeatureConditionalCompilation
+        self.extensions_by_command = None
+        # The file opened by OutputGenerator, while self.outFile collects the module in memory
+        self.realOutFile = None
 
     def beginFile(self, genOpts):
         OutputGenerator.beginFile(self, genOpts)
         if self.genOpts is None:
             raise MissingGeneratorOptionsError()
+        # Accumulate the whole module in memory and write it to the real output file at once in endFile
+        self.realOutFile = self.outFile
+        self.outFile = io.StringIO()
         # V module
-        if self.genOpts.protectFile and self.genOpts.filename:
-            write("""/*
-MIT License
-
-Copyright Anton Oreskin | https://gosudev.de
-
-
-Permission is hereby granted, free of charge, to any person obtaining a copy
-of this software and associated documentation files (the "Software"), to deal
-in the Software without restriction, including without limitation the rights
-to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
-copies of the Software, and to permit persons to whom the Software is
-furnished to do so, subject to the following conditions:
-
-The above copyright notice and this permission notice shall be included in all
-copies or substantial portions of the Software.
-
-THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
-IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
-FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
-AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
-LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
-OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
-SOFTWARE.
-*/""", file=self.outFile)
-            write('module', 'vulkan', file=self.outFile)
-            self.newline()
+        if genOpts.protectFile and genOpts.filename:
+            self.outFile.write(self.V_FILE_HEADER)
 
         # User-supplied prefix text, if any (list of strings)
         if genOpts.prefixText:
@@ -406,20 +435,22 @@ SOFTWARE.
         # Finish V wrapper and multiple inclusion protection
         if self.genOpts is None:
             raise MissingGeneratorOptionsError()
+        if self.realOutFile is not None:
+            self.realOutFile.write(self.outFile.getvalue())
+            self.outFile = self.realOutFile
+            self.realOutFile = None
         # Finish processing in superclass
         OutputGenerator.endFile(self)
 
-        # Write REPLACEMENT_EXACT_TEXT_ARR to replacement_map.txt
+        # Write REPLACEMENT_EXACT_TEXTS to replacement_map.txt
         # This exact C code can then be (manually) put in REPLACEMENT_MAP.
         # genType will then replace the c_body with v_body
         # filepath is "../../../REPLACEMENT_MAP.txt"
         # absolute path is "~/workspace/v_vulkan_bindings/REPLACEMENT_MAP.txt"
         with open(self.REPLACEMENT_MAP_FILE_PATH, "w") as text_file:
-            key_strings = ''
-            for itm in self.REPLACEMENT_EXACT_TEXT_ARR:
-                # Writing to file puts new lines instead of just '\n'
-                key_strings = key_strings + "'" + self.escStr(itm).replace('\\', '\\\\').replace('\n',
-                                                                                                 '\\n') + "':\n    '',\n    "
+            # Writing to file puts new lines instead of just '\n'
+            key_strings = ''.join("'" + self.escStr(itm).translate(self.REPLACEMENT_MAP_KEY_ESCAPE_TABLE) + "':\n    '',\n    "
+                                  for itm in self.REPLACEMENT_EXACT_TEXTS)
             text_file.write("# This mapping contains exact C code (key), which will be replaced with the corresponding V code (value). Use the key in REPLACEMENT_MAP in src/vgenerator.py.\n# genType will then replace c_body with v_body.\n# Check REPLACEMENT_CONTAINS_ARR to add another key.\n\
 REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
 
@@ -454,65 +485,64 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             if self.feature_not_empty:
                 if self.genOpts is None:
                     raise MissingGeneratorOptionsError()
-                if self.genOpts.conventions is None:
+                genOpts = self.genOpts
+                if genOpts.conventions is None:
                     raise MissingGeneratorOptionsConventionsError()
                 is_core = self.featureName and self.featureName.startswith(self.conventions.api_prefix + 'VERSION_')
 
                 self.featureName = self.removeVk(self.featureName).lower()
 
-                if self.genOpts.conventions.writeFeature(self.featureName, self.featureExtraProtect, self.genOpts.filename):
-                    self.newline()
-                    if self.genOpts.protectFeature:
-                        write('#ifndef', self.featureName, file=self.outFile)
+                if genOpts.conventions.writeFeature(self.featureName, self.featureExtraProtect, genOpts.filename):
+                    # Collect the feature text and write it at once.
+                    # Each entry matches what a write() call would have produced.
+                    parts = ['\n']
+                    if genOpts.protectFeature:
+                        parts.append('#ifndef {}\n'.format(self.featureName))
 
                     # If type declarations are needed by other features based on
                     # this one, it may be necessary to suppress the ExtraProtect,
                     # or move it below the 'for section...' loop.
                     if self.featureExtraProtect is not None:
-                        write('#ifdef', self.featureExtraProtect, file=self.outFile)
-                    self.newline()
+                        parts.append('#ifdef {}\n'.format(self.featureExtraProtect))
+                    parts.append('\n')
 
                     self.featureName = self.removeVk(self.featureName)
                     # NOTE Anton: This can be used for programmatically checking available extensions, once conditional compilation is used
-                    #write(f'// {self.featureName} is a preprocessor guard. Do not pass it to API calls.', file=self.outFile)
-                    #write('const', self.featureName, '=', '1', file=self.outFile)
+                    #parts.append(f'// {self.featureName} is a preprocessor guard. Do not pass it to API calls.\n')
+                    #parts.append(f'const {self.featureName} = 1\n')
                     for section in self.TYPE_SECTIONS:
                         contents = self.sections[section]
                         if contents:
-                            write('\n'.join(contents), file=self.outFile)
-                    if self.genOpts.genFuncPointers and self.sections['commandPointer']:
-                        write('\n'.join(self.sections['commandPointer']), file=self.outFile)
-                        self.newline()
+                            parts.append('\n'.join(contents))
+                            parts.append('\n')
+                    if genOpts.genFuncPointers and self.sections['commandPointer']:
+                        parts.append('\n'.join(self.sections['commandPointer']))
+                        parts.append('\n\n')
 
                     if self.sections['command']:
-                        if self.genOpts.protectProto:
-                            write(self.genOpts.protectProto,
-                                  self.genOpts.protectProtoStr, file=self.outFile)
-                        if self.genOpts.protectExtensionProto and not is_core:
-                            write(self.genOpts.protectExtensionProto,
-                                  self.genOpts.protectExtensionProtoStr, file=self.outFile)
-                        write('\n'.join(self.sections['command']), end='', file=self.outFile)
-                        if self.genOpts.protectExtensionProto and not is_core:
-                            write('#endif' +
-                                  self._endProtectComment(protect_directive=self.genOpts.protectExtensionProto,
-                                                          protect_str=self.genOpts.protectExtensionProtoStr),
-                                  file=self.outFile)
-                        if self.genOpts.protectProto:
-                            write('#endif' +
-                                  self._endProtectComment(protect_directive=self.genOpts.protectProto,
-                                                          protect_str=self.genOpts.protectProtoStr),
-                                  file=self.outFile)
+                        if genOpts.protectProto:
+                            parts.append('{} {}\n'.format(genOpts.protectProto, genOpts.protectProtoStr))
+                        if genOpts.protectExtensionProto and not is_core:
+                            parts.append('{} {}\n'.format(genOpts.protectExtensionProto, genOpts.protectExtensionProtoStr))
+                        parts.append('\n'.join(self.sections['command']))
+                        if genOpts.protectExtensionProto and not is_core:
+                            parts.append('#endif' +
+                                         self._endProtectComment(protect_directive=genOpts.protectExtensionProto,
+                                                                 protect_str=genOpts.protectExtensionProtoStr) + '\n')
+                        if genOpts.protectProto:
+                            parts.append('#endif' +
+                                         self._endProtectComment(protect_directive=genOpts.protectProto,
+                                                                 protect_str=genOpts.protectProtoStr) + '\n')
                         else:
-                            self.newline()
+                            parts.append('\n')
                     if self.featureExtraProtect is not None:
-                        write('#endif' +
-                              self._endProtectComment(protect_str=self.featureExtraProtect),
-                              file=self.outFile)
-
-                    if self.genOpts.protectFeature:
-                        write('#endif' +
-                              self._endProtectComment(protect_str=self.featureName),
-                              file=self.outFile)
+                        parts.append('#endif' +
+                                     self._endProtectComment(protect_str=self.featureExtraProtect) + '\n')
+
+                    if genOpts.protectFeature:
+                        parts.append('#endif' +
+                                     self._endProtectComment(protect_str=self.featureName) + '\n')
+                    self.outFile.write(''.join(parts))
         # Finish processing in superclass
         OutputGenerator.endFeature(self)
 
@@ -524,19 +554,20 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             self.logMsg('error', 'Missing section in appendSection (probably a <type> element missing its \'category\' attribute. Text:', text)
             exit(1)
 
-        # Add text to REPLACEMENT_EXACT_TEXT_ARR if it is in REPLACEMENT_CONTAINS_ARR
+        # Add text to REPLACEMENT_EXACT_TEXTS if it is in REPLACEMENT_CONTAINS_ARR
         # See REPLACEMENT_CONTAINS_ARR for explanation
         # Note Anton: https://github.com/vlang/v/issues/24164
         # Function parameter 3 is an array that is not known to V
         if 'pub fn cmd_set_fragment_shading_rate_enum_nv' in text or 'pub fn cmd_set_fragment_shading_rate_khr' in text:
             text = '/*' + text + '*/'
         esc_text = self.escStr(text)
-        for starts_with in self.REPLACEMENT_CONTAINS_ARR:
-            if text.__contains__(starts_with):
-                self.REPLACEMENT_EXACT_TEXT_ARR.append(esc_text)
+        if self.REPLACEMENT_CONTAINS_REGEX.search(text):
+            for starts_with in self.REPLACEMENT_CONTAINS_ARR:
+                if starts_with in text:
+                    self.REPLACEMENT_EXACT_TEXTS[esc_text] = None
+                    break
 
-        if esc_text in self.REPLACEMENT_MAP:
-            text = self.REPLACEMENT_MAP[esc_text]
+        text = self.REPLACEMENT_MAP.get(esc_text, text)
 
         self.sections[section].append(text)
         self.feature_not_empty = True
@@ -576,12 +607,15 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                 # Replace <apientry /> tags with an APIENTRY-style string
                 # (from self.genOpts). Copy other text through unchanged.
                 # If the resulting text is an empty string, do not emit it.
-                body += noneStr(typeElem.text)
+                body_parts = [body, typeElem.text or '']
+                apientry = self.genOpts.apientry
                 for elem in typeElem:
                     if elem.tag == 'apientry':
-                        body += self.genOpts.apientry + noneStr(elem.tail)
+                        body_parts.append(apientry)
                     else:
-                        body += noneStr(elem.text) + noneStr(elem.tail)
+                        body_parts.append(elem.text or '')
+                    body_parts.append(elem.tail or '')
+                body = ''.join(body_parts)
                 if category == 'define' and self.misracppstyle():
                     body = body.replace("(uint32_t)", "static_cast<uint32_t>")
             if body:
@@ -617,6 +651,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                 raise MissingGeneratorOptionsError()
 
             body = self.deprecationComment(typeElem)
+            removeVk = self.removeVk
 
             v_name = ''
             v_value = v_name
@@ -636,34 +671,32 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                 # (from self.genOpts). Copy other text through unchanged.
                 # If the resulting text is an empty string, do not emit it.
                 for elem in typeElem:
+                    elem_text = elem.text or ''
+                    elem_tail = elem.tail or ''
                     if elem.tag == 'apientry':
-                        body += self.genOpts.apientry + noneStr(elem.tail)
+                        body += self.genOpts.apientry + elem_tail
                     elif elem.tag == 'type':
-                        if noneStr(elem.text) == 'VK_DEFINE_HANDLE':
+                        if elem_text == 'VK_DEFINE_HANDLE':
                             v_type = '&{}'.format('C.Vk' + name)
                             v_is_handle = True
-                        elif noneStr(elem.text) == 'VK_DEFINE_NON_DISPATCHABLE_HANDLE':
+                        elif elem_text == 'VK_DEFINE_NON_DISPATCHABLE_HANDLE':
                             # Note: Not sure if we want 64 bit pointers for opaque types, instead of voidptr
                             # v_type = 'u64(&{})'.format(name)
-                            # self.C_STRUCT_ARR.append(name)
+                            # self.C_STRUCT_SET.add(name)
                             v_type = '&{}'.format('C.' + name)
                             v_is_handle = True
                         else:
-                            v_type = noneStr(elem.text)
-                            param_name = (noneStr(elem.tail)
-                                          .replace(',', '')
-                                          .replace(' ', '')
-                                          .replace(')', '')
-                                          .replace(';', '')
+                            v_type = elem_text
+                            param_name = (elem_tail
+                                          .translate(self.PARAM_NAME_STRIP_TABLE)
                                           # No const type here, but handled later for const_ function parameters
                                           .replace('\nconst', '')
                                           .strip()
                                           )
 
-                            if v_type in self.TYPE_MAP:
-                                v_type = self.TYPE_MAP[v_type]
+                            v_type = self.TYPE_MAP.get(v_type, v_type)
 
-                            v_type = self.removeVk(v_type)
+                            v_type = removeVk(v_type)
 
                             if 'PFN_' in name and '*' in body:
                                 v_params[0] = (v_params[0][0], 'voidptr')
@@ -672,55 +705,47 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                                 ptr_count = param_name.count('*')
                                 # NOTE Anton: Removing const, as it just signals that the pointer won't be changed by vulkan
                                 param_name = param_name.replace('*', '').replace('const', '').strip()
-                                if v_type in self.C_STRUCT_ARR:
-                                    for _ in range(ptr_count):
-                                        v_type = '&' + v_type 
-                                else:
-                                    for _ in range(ptr_count):
-                                        v_type = '&' + v_type 
+                                v_type = '&' * ptr_count + v_type
                                 # In case of 'void*', v_type will be just '&', as void was replaced with empty string by TYPE_MAP
                                 if v_type.replace('&', '') == '':
                                     v_type = 'voidptr'
-                            elif v_type in self.C_STRUCT_ARR:
-                                pass
 
-                            v_type = self.removeVk(v_type)
-                            v_name = self.removeVk(v_name)
-                            param_name = self.removeVk(param_name)
+                            v_type = removeVk(v_type)
+                            v_name = removeVk(v_name)
+                            param_name = removeVk(param_name)
 
                             # Name and type are appended to v_params in separate runs of the for loop,
                             # but always in order, so that we can simply assume the last tuple contains
                             # the current v_name
-                            if v_is_function_pointer and len(v_params) > 0:
-                                last_tuple = v_params[len(v_params) - 1]
+                            if v_is_function_pointer and v_params:
+                                last_tuple = v_params[-1]
                                 if last_tuple[0] is not None and last_tuple[1] is not None:
                                     v_params.append((param_name, v_type))
                                 else:
-                                    v_params[len(v_params) - 1] = (last_tuple[0], v_type)
+                                    v_params[-1] = (last_tuple[0], v_type)
                             else:
                                 v_params.append((param_name, v_type))
                         v_text = 'type'
                     elif elem.tag == 'name':
                         v_name = name
-                        v_name = self.removeVk(v_name)
+                        v_name = removeVk(v_name)
                         if v_is_handle:
-                            self.C_STRUCT_ARR.append(v_name)
-                            self.C_STRUCT_ARR_WITH_VK_PREFIX.append(v_name)
-                        if v_is_function_pointer and len(v_params) > 0:
-                            last_tuple = v_params[len(v_params) - 1]
+                            self.C_STRUCT_SET.add(v_name)
+                            self.C_STRUCT_SET_WITH_VK_PREFIX.add(v_name)
+                        if v_is_function_pointer and v_params:
+                            last_tuple = v_params[-1]
                             if last_tuple[0] is not None and last_tuple[1] is not None:
                                 v_params.append((v_name, ''))
                             else:
-                                v_params[len(v_params) - 1] = (v_name, last_tuple[1])
+                                v_params[-1] = (v_name, last_tuple[1])
                         else:
                             # Something like
                             # pub type PFN_vkDebugReportCallbackEXT = fn (...) Bool32
                             # Get return type from "typedef VkBool32 (VKAPI_PTR *"
                             if typeElem.text is not None and ' (VKAPI_PTR *' in typeElem.text:
                                 v_pfn_ret = typeElem.text.replace('typedef ','').replace(' (VKAPI_PTR *', '')
-                                v_pfn_ret = self.removeVk(v_pfn_ret)
-                                if v_pfn_ret in self.TYPE_MAP:
-                                    v_pfn_ret = self.TYPE_MAP[v_pfn_ret]
+                                v_pfn_ret = removeVk(v_pfn_ret)
+                                v_pfn_ret = self.TYPE_MAP.get(v_pfn_ret, v_pfn_ret)
                                 v_params.append((v_name, v_pfn_ret))
                             else:
                                 v_params.append((v_name, ''))
@@ -728,15 +753,15 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                     if category == 'define' and self.misracppstyle():
                         body = body.replace("(uint32_t)", "static_cast<uint32_t>")
                     else:
-                        v_value = noneStr(elem.text) + noneStr(elem.tail).replace(';', '')
+                        v_value = elem_text + elem_tail.replace(';', '')
                         v_text = 'type'
-            v_type = self.removeVk(v_type)
-            v_name = self.removeVk(v_name)
-            v_value = self.removeVk(v_value)
+            v_type = removeVk(v_type)
+            v_name = removeVk(v_name)
+            v_value = removeVk(v_value)
 
             # V doesn't allow for non basetype (u32, u64) alias,
             # so add the current type to ALIAS_TO_BASE_TYPE_MAP
-            if v_text == 'type' and v_type in self.BASE_TYPES_ARR:
+            if v_text == 'type' and v_type in self.BASE_TYPES_SET:
                 self.ALIAS_TO_BASE_TYPE_MAP[v_name] = v_type
             if v_is_handle:
                 body = '// Pointer to {}_T\npub type {} = voidptr'.format(name, v_name)
@@ -755,16 +780,17 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                 body = 'pub type {} = fn ({}) {}'.format(v_name, v_params_str, v_params[0][1])
                 # V bug where fn type definitons can not be multiple lines
                 # TODO: Double check and create an issue on V github
-                body = ' '.join(body.split('\n'))
+                body = body.replace('\n', ' ')
             elif v_text and v_name and v_type:
                 # V doesn't allow for non basetype (u32, u64, ...) alias,
                 # so find the root basetype and assign that instead.
                 # This is also needed for setting mut on function calls later
-                if v_type in self.BASE_TYPES_ARR:
+                if v_type in self.BASE_TYPES_SET:
                     self.ALIAS_TO_BASE_TYPE_MAP[v_name] = v_type
                 else:
-                    if v_type in self.ALIAS_TO_BASE_TYPE_MAP:
-                        v_type = self.ALIAS_TO_BASE_TYPE_MAP[v_type]
+                    base_type = self.ALIAS_TO_BASE_TYPE_MAP.get(v_type)
+                    if base_type is not None:
+                        v_type = base_type
                         self.ALIAS_TO_BASE_TYPE_MAP[v_name] = v_type
                 v_name, v_type = self.v_translate_c_name_to_basetype(v_name,  v_type)
                 if v_type == 'MAKE_API_VERSION':
@@ -823,24 +849,37 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         return (protect_if_str, protect_end_str)
 
     def typeMayAlias(self, typeName):
-        if not self.may_alias:
+        if self.may_alias is None:
             if self.registry is None:
                 raise MissingRegistryError()
             # First time we have asked if a type may alias.
             # So, populate the set of all names of types that may.
 
-            # Everyone with an explicit mayalias="true"
-            self.may_alias = set(typeName
-                                 for typeName, data in self.registry.typedict.items()
-                                 if data.elem.get('mayalias') == 'true')
-
-            # Every type mentioned in some other type's parentstruct attribute.
-            polymorphic_bases = (otherType.elem.get('parentstruct')
-                                 for otherType in self.registry.typedict.values())
-            self.may_alias.update(set(x for x in polymorphic_bases
-                                      if x is not None))
+            # Everyone with an explicit mayalias="true" and every type
+            # mentioned in some other type's parentstruct attribute.
+            may_alias = set()
+            for name, data in self.registry.typedict.items():
+                elem = data.elem
+                if elem.get('mayalias') == 'true':
+                    may_alias.add(name)
+                parentstruct = elem.get('parentstruct')
+                if parentstruct is not None:
+                    may_alias.add(parentstruct)
+            self.may_alias = may_alias
         return typeName in self.may_alias
 
+    # Same as registry.tree.find("enums/enum[@name='...']"), without searching the whole registry each time
+    def findEnumElem(self, enumName):
+        if self.enum_elems_by_name is None:
+            if self.registry is None:
+                raise MissingRegistryError()
+            enum_elems_by_name = {}
+            for elem in self.registry.tree.iterfind('enums/enum'):
+                # First match wins, like find
+                enum_elems_by_name.setdefault(elem.get('name'), elem)
+            self.enum_elems_by_name = enum_elems_by_name
+        return self.enum_elems_by_name.get(enumName)
+
     def genStruct(self, typeinfo, typeName, alias,  keep_vk_member_name = False):
         """Generate struct (e.g. C "struct" type).
 
@@ -859,6 +898,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             raise MissingGeneratorOptionsError()
 
         typeElem = typeinfo.elem
+        attrib = typeElem.attrib
         typeNameOrig = typeName
         typeName = self.removeVk(typeName)
         body = self.deprecationComment(typeElem)
@@ -867,16 +907,16 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             typeName,  alias = self.v_translate_c_name_to_basetype(typeName, alias)
             body = 'pub type ' + typeName + ' = ' + alias + '\n'
         else:
-            (protect_begin, protect_end) = self.genProtectString(typeElem.get('protect'))
+            (protect_begin, protect_end) = self.genProtectString(attrib.get('protect'))
             if protect_begin:
                 body += protect_begin
 
             if self.genOpts.genStructExtendsComment:
-                structextends = typeElem.get('structextends')
+                structextends = attrib.get('structextends')
                 body += '// ' + typeName + ' extends ' + structextends + '\n' if structextends else ''
 
             body += 'pub type ' + typeName + ' = ' + 'C.'+ typeNameOrig + '\n'
-            if typeElem.get('category') == 'struct':
+            if attrib.get('category') == 'struct':
                 body += '@[typedef]\npub struct '
             else:
                 body += '@[typedef]\npub union '
@@ -893,9 +933,12 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                 
             targetLen = self.getMaxCParamTypeLength(typeinfo)
             body += 'pub mut:\n'
-            for member in typeElem.findall('.//member'):
-                body += self.deprecationComment(member, indent = 4)
-                body += self.makeVParamDecl(typeName, member, targetLen + 4, do_struct_members = True,  keep_vk_member_name = keep_vk_member_name)
+            deprecationComment = self.deprecationComment
+            makeVParamDecl = self.makeVParamDecl
+            # <member> tags are always direct children of the <type> tag
+            for member in typeElem.findall('member'):
+                body += deprecationComment(member, indent = 4)
+                body += makeVParamDecl(typeName, member, targetLen + 4, do_struct_members = True,  keep_vk_member_name = keep_vk_member_name)
                 body += '\n'
             body += '}\n'
             if protect_end:
@@ -927,9 +970,9 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         # Same is done in genGroup, genStruct, genType
         if alias:
             cbody = 'typedef ' + alias + ' ' + groupName + ';\n'
-            if cbody in self.REPLACEMENT_MAP:
-                cbody = self.REPLACEMENT_MAP[cbody]
-                self.appendSection(section, cbody)
+            replacement = self.REPLACEMENT_MAP.get(cbody)
+            if replacement is not None:
+                self.appendSection(section, replacement)
             else:
                 groupName,  alias = self.v_translate_c_name_to_basetype(groupName, alias)
                 body = 'pub type ' + groupName + ' = ' + alias + '\n'
@@ -979,17 +1022,13 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         if strVal.lower().startswith('vk') or strVal.startswith('0x'):
             v_value = strVal
         else:
-            v_value = (strVal.replace('~', '')
-                             .replace('U', '')
-                             .replace('L', '')
-                             .replace('F', '')
-                             .replace('(', '')
-                             .replace(')', ''))
+            v_value = strVal.translate(self.CONSTANT_VALUE_STRIP_TABLE)
 
         if enuminfo.elem.get('type') and not alias:
             typeStr = enuminfo.elem.get('type')
-            if typeStr in self.TYPE_MAP:
-                v_type = self.TYPE_MAP[typeStr]
+            mapped_type = self.TYPE_MAP.get(typeStr)
+            if mapped_type is not None:
+                v_type = mapped_type
             else:
                 print("Could not find matching V type for " + typeStr)
             if '~' in strVal:
@@ -1000,20 +1039,22 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         # pub const vk_khr_maintenance_1_extension_name = "VK_KHR_maintenance1"
         # But .lower() the value for references to vk_khr_external_memory_capabilities_extension_name, like
         # pub const vk_khr_maintenance1_extension_name = vk_khr_maintenance_1_extension_name
-        if not v_name.lower().endswith("_extension_name") or not v_value.startswith('"'):
-            v_value = v_value.lower()
-        if v_name.lower().endswith("_extension_name") and v_value.startswith('"'):
+        is_extension_name_string = v_name.endswith("_extension_name") and v_value.startswith('"')
+        if is_extension_name_string:
             v_value = 'c'+ v_value # Use c strings c'text'
+        else:
+            v_value = v_value.lower()
 
         v_name = self.removeVk(v_name)
         v_value = self.removeVk(v_value)
 
+        decl_start = 'pub const ' + v_name.ljust(self.CONST_NAME_ALIGN) + ' = ' + prefix
         if prefix:
-            body = 'pub const ' + v_name.ljust(33) + ' = ' + prefix + v_type + "(" + v_value + ")"
+            body = decl_start + v_type + "(" + v_value + ")"
         elif not v_type.strip():
-            body = 'pub const ' + v_name.ljust(33) + ' = ' + prefix + v_type.strip() + v_value
+            body = decl_start + v_type.strip() + v_value
         else:
-            body = 'pub const ' + v_name.ljust(33) + ' = ' + prefix + v_type.strip() + "(" + v_value + ")"
+            body = decl_start + v_type.strip() + "(" + v_value + ")"
 
         return body
 
@@ -1036,46 +1077,57 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         return self.genOpts.misracppstyle
 
     # Remove Vk... from variable names, as they are all in the vulkan name space already
-    def removeVk(self, v_name_or_value: string) -> str:
-        if v_name_or_value.lower() in ['vk_true', 'vk_false']:
-            return v_name_or_value[2:] #_true _false
-        if v_name_or_value.lower().startswith('vk_'):
-            v_name_or_value = v_name_or_value[3:]
-        if v_name_or_value.lower().startswith('vk'):
-            v_name_or_value = v_name_or_value[2:]
-        return v_name_or_value
+    def removeVk(self, v_name_or_value: str) -> str:
+        cached = self.REMOVE_VK_CACHE.get(v_name_or_value)
+        if cached is not None:
+            return cached
+        name = v_name_or_value
+        name_lower = name.lower()
+        if name_lower in ('vk_true', 'vk_false'):
+            name = name[2:] #_true _false
+        elif name_lower.startswith('vk'):
+            if name_lower.startswith('vk_'):
+                name = name[3:]
+                # VK_VK_... loses both prefixes
+                if name_lower.startswith('vk', 3):
+                    name = name[2:]
+            else:
+                name = name[2:]
+        self.REMOVE_VK_CACHE[v_name_or_value] = name
+        return name
 
     # V doesn't allow for non basetype (u32, u64) aliases,
     # so find the root basetype and assign that instead.
     # Returns basetype if found, the unchanged alias if not found
-    def v_translate_c_name_to_basetype(self, name = None, alias = None) -> (str, str):
+    def v_translate_c_name_to_basetype(self, name = None, alias = None) -> tuple[str, str]:
         alias = self.removeVk(alias)
         name = self.removeVk(name)
         ptr_count = alias.count('&')
-        if alias in self.BASE_TYPES_ARR:
+        if alias in self.BASE_TYPES_SET:
             self.ALIAS_TO_BASE_TYPE_MAP[name] = alias
-        elif alias in self.C_STRUCT_ARR:
+        elif alias in self.C_STRUCT_SET:
             alias = 'voidptr'
         # &C.VkCommandBuffer -> CommandBuffer
-        elif self.removeVk(alias.lstrip('&')) in self.C_STRUCT_ARR:
+        elif self.removeVk(alias.lstrip('&')) in self.C_STRUCT_SET:
             for _ in range(ptr_count):
                 alias = '&' + alias 
             alias = 'C.Vk' + alias
             self.ALIAS_TO_BASE_TYPE_MAP[name] = alias
         else:
-            if alias in self.ALIAS_TO_BASE_TYPE_MAP:
-                alias = self.ALIAS_TO_BASE_TYPE_MAP[alias]
+            base_type = self.ALIAS_TO_BASE_TYPE_MAP.get(alias)
+            if base_type is not None:
+                alias = base_type
                 self.ALIAS_TO_BASE_TYPE_MAP[name] = alias
 
         return name,  alias
     
     # TODO: remove, as only called once
     def v_translate_type_basetype(self,  type) -> str:
-        if type in self.C_STRUCT_ARR_WITH_VK_PREFIX:
+        if type in self.C_STRUCT_SET_WITH_VK_PREFIX:
             return 'voidptr'
 #        if type.startswith('['):
 #            type = 'voidptr'
-#        if type.startswith('&') or type.lstrip('&') in self.C_STRUCT_ARR_WITH_VK_PREFIX:
+#        if type.startswith('&') or type.lstrip('&') in self.C_STRUCT_SET_WITH_VK_PREFIX:
 #            type_without_amp = type[1:]
 #            ptr_count = 1
 #            if type_without_amp.startswith('&'):
@@ -1091,17 +1143,34 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         
         return type
 
+    # Called for nearly every identifier, so the regex rule above is applied in a single pass over the characters.
+    # Put '_' before an upper case ASCII letter, if it follows a lower case letter or digit,
+    # or if it is not the first character and is followed by a lower case letter.
     def v_camel_to_snake_case(self, v_name) -> str:
-        return self.CAMEL_TO_SNAKE_CASE_REGEX.sub(r'_\1', v_name).lower()
+        cached = self.SNAKE_CASE_CACHE.get(v_name)
+        if cached is not None:
+            return cached
+        # Already snake case names, like lowered enum members, have no upper case letter to split at
+        if v_name.islower():
+            self.SNAKE_CASE_CACHE[v_name] = v_name
+            return v_name
+        out = []
+        prev = ''
+        last = len(v_name) - 1
+        for i, ch in enumerate(v_name):
+            if 'A' <= ch <= 'Z' and i > 0 and ('a' <= prev <= 'z' or '0' <= prev <= '9' or (i < last and 'a' <= v_name[i + 1] <= 'z')):
+                out.append('_')
+            out.append(ch)
+            prev = ch
+        snake_case = ''.join(out).lower()
+        self.SNAKE_CASE_CACHE[v_name] = snake_case
+        return snake_case
 
     def find_matching_structure_type_enum(self, v_name) -> str:
-        name_without_underscore_lower = v_name.replace("_", "").lower()
-        for type_enum in self.STRUCTURE_TYPES:
-            if type_enum.replace("_", "") == name_without_underscore_lower:
-                return type_enum
-        return ""
+        name_without_underscore_lower = v_name.translate(self.DELETE_UNDERSCORE_TABLE).lower()
+        return self.STRUCTURE_TYPES_WITHOUT_UNDERSCORE.get(name_without_underscore_lower, "")
 
-    def removeStructEnumNameFromMember(self,  structEnumName,  memberName) -> string:
+    def removeStructEnumNameFromMember(self,  structEnumName,  memberName) -> str:
         # VideoCodecOperationFlagBitsKHR.video_codec_operation_encode_h264_bit_khr
         # VideoCodecOperationFlagBitsKHR.encode_h264
         newName = memberName
@@ -1180,17 +1249,21 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             raise MissingGeneratorOptionsConventionsError()
         indent = '    '
         paramdecl = indent
-        prefix = noneStr(param.text)
+        prefix = param.text or ''
         v_type = ''
         v_name = ''
         v_type_without_pointer = ''
         is_const = False
+        type_map_get = self.TYPE_MAP.get
+        removeVk = self.removeVk
+        v_camel_to_snake_case = self.v_camel_to_snake_case
+        array_regex_match = self.ARRAY_REGEX.match
         
         for elem in param:
-            text = noneStr(elem.text)
+            text = elem.text or ''
             if 'const ' in text:
                 is_const = True
-            tail = noneStr(elem.tail)
+            tail = elem.tail or ''
             text_plus_tail = text + tail.strip()
             # Note: vk.xml registry has the attribute optional = true
             # double check @[required] in V
@@ -1198,13 +1271,14 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
 
             if elem.tag == 'type':
                 # Translate C type to V type
-                if text_plus_tail in self.TYPE_MAP:
-                    v_type = self.TYPE_MAP[text_plus_tail]
+                mapped_type = type_map_get(text_plus_tail)
+                if mapped_type is not None:
+                    v_type = mapped_type
                 else:
                     # if type is not mapped to V, it's mostly something like 'VkDeviceQueueCreateInfo*',
                     # so just replace * with & and move it to the left
                     v_type = text_plus_tail
-                    v_type = self.removeVk(v_type)
+                    v_type = removeVk(v_type)
                     ptr_count = v_type.count('*')
 
                     if '*' in v_type:
@@ -1212,23 +1286,17 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                         # Also, convert * to & and keep count
                         v_type_without_pointer =  v_type.replace('const ', '').replace('const', '')
                         v_type_without_pointer = v_type_without_pointer.replace('*', '').strip()
-                        if v_type_without_pointer in self.TYPE_MAP:
+                        mapped_type = type_map_get(v_type_without_pointer)
+                        if mapped_type is not None:
                             # In case of 'void', TYPE_MAP will return empty string
-                            if self.TYPE_MAP[v_type_without_pointer] == '':
+                            if mapped_type == '':
                                 v_type = ('&'*(ptr_count-1)) + 'voidptr'
                             else:
-                                v_type = ('&'*(ptr_count)) + self.TYPE_MAP[v_type_without_pointer]
+                                v_type = ('&'*(ptr_count)) + mapped_type
                         else:
-                            if v_type_without_pointer in self.ALIAS_TO_BASE_TYPE_MAP:
-                                if self.ALIAS_TO_BASE_TYPE_MAP[v_type_without_pointer].startswith('C.'):
-                                    #v_type = ('&'*(pointer_count-1)) + v_type_without_pointer
-                                    v_type = ('&'*(ptr_count)) + v_type_without_pointer
-                                else:
-                                    v_type = ('&'*ptr_count) + v_type_without_pointer
-
-                            else:
-                                v_type = ('&'*ptr_count)  + v_type_without_pointer
-                    elif v_type in self.C_STRUCT_ARR:
+                            # Aliases of C structs and of base types get the same pointers
+                            v_type = ('&'*ptr_count) + v_type_without_pointer
+                    elif v_type in self.C_STRUCT_SET:
                         pass
                     elif v_type.lower().startswith("pfn_"):
                         v_type = v_type + ' = unsafe { nil }'
@@ -1237,7 +1305,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             else:
                 v_name = prefix + text_plus_tail
                 if not keep_vk_member_name:
-                    v_name = self.removeVk(v_name)
+                    v_name = removeVk(v_name)
             
 
             if self.should_insert_may_alias_macro and self.genOpts.conventions.is_voidpointer_alias(elem.tag, text, tail):
@@ -1259,12 +1327,12 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
 
             #NOTE Anton: pipeline_cache_uuid [VK_UUID_SIZE]u8
             #                  to pipeline_cache_uuid [uuid_size]u8
-            array_match = self.ARRAY_REGEX.match(v_name)
+            array_match = array_regex_match(v_name)
             if array_match:
                 v_name = v_name.replace(array_match.group(1), '')
                 # Squeeze next dimension in multidimensional arrays between type and last dimension
                 last_index_of_arr = v_type.rfind(']')+1
-                v_type = v_type[:last_index_of_arr] + '[' + self.removeVk(array_match.group(1).lower().replace('[', '').replace(']', '')) + ']' + v_type[last_index_of_arr:]
+                v_type = v_type[:last_index_of_arr] + '[' + removeVk(array_match.group(1).lower().replace('[', '').replace(']', '')) + ']' + v_type[last_index_of_arr:]
                 if do_array_voidptr:
                     v_type = 'voidptr'
 
@@ -1279,7 +1347,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             # Note Anton: Remove lower() once V allows for upper case members
             # https://github.com/vlang/v/issues/20420
             if not keep_vk_member_name:
-                v_name = self.v_camel_to_snake_case(v_name)
+                v_name = v_camel_to_snake_case(v_name)
             # Note Anton: After adding param names for const_ prefix, `type ImageType` throws error: unknown type `vulkan.type`
             # So, change function parameter name
             if not do_struct_members and v_name == 'type':
@@ -1304,35 +1372,35 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                 paramdecl = paramdecl.replace(v_type, 'voidptr') + ' = unsafe{ nil }'
             if v_name == 'pUserData' and v_type == 'voidptr':
                 paramdecl = paramdecl + ' = unsafe{ nil }'
-            
-            # For each item also check if its sType and can get a default value for StructureType
-            if v_name == 'sType':
-                # PhysicalDeviceVulkan13Features -> physical_device_vulkan1_3_features
-                struct_type_enum = self.v_camel_to_snake_case(typeName).lower()
-                if struct_type_enum in self.STRUCTURE_TYPES:
-                    paramdecl = paramdecl + ' = StructureType.' + struct_type_enum
-                else:
-                    struct_type_enum = self.find_matching_structure_type_enum(typeName).lower()
-                    if struct_type_enum != "":
-                        paramdecl = paramdecl + ' = StructureType.' + struct_type_enum
 
             # Clear prefix for subsequent iterations
             if (prefix.find('const ') != -1):
                 is_const = True
             prefix = ''
+
+        # Check if its sType and can get a default value for StructureType
+        # Only depends on the final name, so this runs once after all elements are handled
+        if v_name == 'sType':
+            # PhysicalDeviceVulkan13Features -> physical_device_vulkan1_3_features
+            struct_type_enum = v_camel_to_snake_case(typeName).lower()
+            if struct_type_enum in self.STRUCTURE_TYPES:
+                paramdecl = paramdecl + ' = StructureType.' + struct_type_enum
+            else:
+                struct_type_enum = self.find_matching_structure_type_enum(typeName).lower()
+                if struct_type_enum != "":
+                    paramdecl = paramdecl + ' = StructureType.' + struct_type_enum
             
        # Set mut for function paramters that are not const, except for enum types
        # Note: Ignoring base types,
        # because mutable arguments are only allowed for arrays, interfaces, maps, pointers, structs or their aliases
         if (is_const == False and not do_struct_members):# and not do_c_to_v_func_call_params):
                 type_to_check = v_type
-                m = re.match(r'(?:&|\[\d*\])*(?:C\.Vk)?(.*)', type_to_check)                    
+                m = self.PARAM_BASE_TYPE_REGEX.match(type_to_check)
                 if (m):
                     type_to_check = m.group(1)
                 if (not type_to_check in self.ENUM_TYPES
-                and not type_to_check in self.BASE_TYPES_ARR
-                and (not type_to_check in self.ALIAS_TO_BASE_TYPE_MAP
-                or not self.ALIAS_TO_BASE_TYPE_MAP[type_to_check] in self.BASE_TYPES_ARR)
+                and not type_to_check in self.BASE_TYPES_SET
+                and self.ALIAS_TO_BASE_TYPE_MAP.get(type_to_check) not in self.BASE_TYPES_SET
                 ):
                     paramdecl = 'mut' + paramdecl # TODO: When using /* mut */ error: inline comment is deprecated, please use line comment
                     pass
@@ -1406,15 +1474,15 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         flagTypeName = self.removeVk(flagTypeName)
 
         # Prefix
-        body = "// Flag bits for " + flagTypeName + "\n"
+        body = ["// Flag bits for " + flagTypeName + "\n"]
 
         if bitwidth == 64:
-            body += "pub type %s = u64\n" % flagTypeName
+            body.append("pub type %s = u64\n" % flagTypeName)
             # Vlang doesn't allow for non basetype (u32, u64) aliases,
             # so add the current type alias to BASE_TYPE_MAP
             self.ALIAS_TO_BASE_TYPE_MAP[flagTypeName] = 'u64'
         else:
-            body += "pub type %s = u32\n" % flagTypeName
+            body.append("pub type %s = u32\n" % flagTypeName)
             self.ALIAS_TO_BASE_TYPE_MAP[flagTypeName] = 'u32'
 
         # Maximum allowable value for a flag (unsigned 64-bit integer)
@@ -1432,7 +1500,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         # them following the numeric values, to allow for aliases.
         # NOTE: this does not do a topological sort yet, so aliases of
         # aliases can still get in the wrong order.
-        aliasText = ''
+        aliasText = []
 
         # Loop over the nested 'enum' tags.
         for elem in enums:
@@ -1469,12 +1537,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             if strVal.lower().startswith('vk'):
                 v_value = strVal
             else:
-                v_value = (strVal.replace('~', '')
-                                 .replace('U', '')
-                                 .replace('L', '')
-                                 .replace('F', '')
-                                 .replace('(', '')
-                                 .replace(')', ''))
+                v_value = strVal.translate(self.CONSTANT_VALUE_STRIP_TABLE)
 
             # Range check for the enum value
             if numVal is not None and (numVal > maxValidValue or numVal < minValidValue):
@@ -1488,7 +1551,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                 if protect is not None:
                     pass
 
-                body += self.deprecationComment(elem, indent = 0)
+                body.append(self.deprecationComment(elem, indent = 0))
                 if usedefine:
                     decl += "#define {} {}\n".format(name, strVal)
                 elif self.misracppstyle():
@@ -1498,7 +1561,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                     # So initializing an alias from another 'static const' value would fail to compile.
                     # Work around this by chasing the aliases to get the actual value.
                     while numVal is None:
-                        alias = self.registry.tree.find("enums/enum[@name='" + strVal + "']")
+                        alias = self.findEnumElem(strVal)
                         if alias is not None:
                             (numVal, strVal) = self.enumToValue(alias, True, bitwidth, True)
                         else:
@@ -1518,23 +1581,23 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                         decl += "pub const {} = {}\n".format(v_name, val_concat)
                     else:
                         #NOTE Anton: vk_true and vk_false are hardcoded. To keep the prefix
-                        if v_value.lower().startswith("vk"):
+                        if v_value.startswith("vk"):
                             decl += "pub const {} = {}\n".format(v_name, v_value)
                         else:
                             decl += "pub const {} = {}\n".format(v_name, prefix + v_type + '(' + v_value + ')')
 
                 if numVal is not None:
-                    body += decl
+                    body.append(decl)
                 else:
-                    aliasText += decl
+                    aliasText.append(decl)
 
                 if protect is not None:
                     pass
 
         # Now append the non-numeric enumerant values
-        body += aliasText
+        body.extend(aliasText)
 
-        return ("bitmask", body)
+        return ("bitmask", ''.join(body))
 
     # Note Anton: the oiginal method comes from vulkandocs/scripts/generator.py
     def buildEnumVDecl_Enum(self, expand, groupinfo, groupName, keep_vk_member_name=False):
@@ -1548,10 +1611,10 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
 
         # Break the group name into prefix and suffix portions for range
         # enum generation
-        expandName = re.sub(r'([0-9]+|[a-z_])([A-Z0-9])', r'\1_\2', groupName).upper()
+        expandName = self.ENUM_EXPAND_NAME_REGEX.sub(r'\1_\2', groupName).upper()
         expandPrefix = expandName
         expandSuffix = ''
-        expandSuffixMatch = re.search(r'[A-Z][A-Z]+$', groupName)
+        expandSuffixMatch = self.ENUM_EXPAND_SUFFIX_REGEX.search(groupName)
         if expandSuffixMatch:
             expandSuffix = '_' + expandSuffixMatch.group()
             # Strip off the suffix from the prefix
@@ -1597,11 +1660,15 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         maxName = None
         minValue = None
         maxValue = None
+        enumToValue = self.enumToValue
+        number_with_underscore_sub = self.STRUCTURE_TYPES_NUMBER_WITH_UNDERSCORE_REGEX.sub
+        removeVk = self.removeVk
+        removeStructEnumNameFromMember = self.removeStructEnumNameFromMember
         for elem in enums:
             # Convert the value to an integer and use that to track min/max.
             # Values of form -(number) are accepted but nothing more complex.
             # Should catch exceptions here for more complex constructs. Not yet.
-            (numVal, strVal) = self.enumToValue(elem, True)
+            (numVal, strVal) = enumToValue(elem, True)
             name = elem.get('name')
 
             # Handle StructureType Enum customly to set a default s_type in structs later
@@ -1610,13 +1677,13 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             # Matching s_type = structure_type_surface_capabilities2_ext
             # To fix an issue, where the default s_type enum doesn't match the StructureType enum
             # replace '_2' with '2'
-            name = self.STRUCTURE_TYPES_NUMBER_WITH_UNDERSCORE_REGEX.sub(r'\g<num_after_underscore>', name)
+            name = number_with_underscore_sub(r'\g<num_after_underscore>', name)
 
             # V doesn't allow for upper case enum member names
             if not keep_vk_member_name:
-                name = self.removeVk(name).lower()
+                name = removeVk(name).lower()
             
-            name = self.removeStructEnumNameFromMember(groupName,  name)
+            name = removeStructEnumNameFromMember(groupName,  name)
             
             # Extension enumerants are only included if they are required
             if self.isEnumRequired(elem):
@@ -1635,7 +1702,8 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                     decl += '    {} = {}'.format(name, strVal)
                 # Append all items in StructureType struct. Later used to set default sType if found in STRUCTURE_TYPES
                 if groupName == 'StructureType':
-                    self.STRUCTURE_TYPES.append(name)
+                    self.STRUCTURE_TYPES[name] = None
+                    self.STRUCTURE_TYPES_WITHOUT_UNDERSCORE.setdefault(name.translate(self.DELETE_UNDERSCORE_TABLE), name)
                 if protect is not None:
                     decl += '\n#endif'
                 if numVal is not None:
@@ -1672,7 +1740,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             self.conventions.generate_max_enum_in_docs):
 
             # NOTE Anton: V doesn't allow for upper case enum member names
-            expandPrefix = self.removeVk(expandPrefix).lower()
+            expandPrefix = removeVk(expandPrefix).lower()
             expandSuffix = expandSuffix.lower()
             # NOTE Anton: Sometimes a member named `invalid` has the same value as max_int and would be duplicate
             if ((len(list(filter (lambda x : (x.find('int(0x7FFFFFFF)') != -1 or x.find('int(0xFFFFFFFF)') != -1), body))) <= 0)):
@@ -1700,13 +1768,15 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         - cmd - Element containing a `<command>` tag"""
         if self.genOpts is None:
             raise MissingGeneratorOptionsError()
+        genOpts = self.genOpts
         proto = cmd.find('proto')
         params = cmd.findall('param')
         # Begin accumulating prototype and typedef strings
-        pdecl = self.genOpts.apicall
+        pdecl = genOpts.apicall
         tdecl = 'typedef '
         v_type = ''
         v_name = ''
+        type_map_get = self.TYPE_MAP.get
 
         # Insert the function return type/name.
         # For prototypes, add APIENTRY macro before the name
@@ -1716,20 +1786,21 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         # etree has elem.text followed by (elem[i], elem[i].tail)
         #   for each child element and any following text
         # Leading text
-        pdecl += noneStr(proto.text)
-        tdecl += noneStr(proto.text)
+        pdecl += (proto.text or '')
+        tdecl += (proto.text or '')
         # For each child element, if it is a <name> wrap in appropriate
         # declaration. Otherwise append its contents and tail contents.
         for elem in proto:
-            text = noneStr(elem.text)
-            tail = noneStr(elem.tail)
+            text = elem.text or ''
+            tail = elem.tail or ''
             text_plus_tail = text + tail.strip()
 
             if elem.tag == 'type':
                 # Translate C type to V type
                 v_type = text_plus_tail
-                if v_type in self.TYPE_MAP:
-                    v_type = self.TYPE_MAP[v_type]
+                mapped_type = type_map_get(v_type)
+                if mapped_type is not None:
+                    v_type = mapped_type
                 else:
                     v_type = self.removeVk(v_type)
 
@@ -1738,8 +1809,9 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
                     ptr_count = v_type.count('*')
                     if '*' in v_type:
                         v_type_without_pointer = v_type.replace('*', '')
-                        if v_type_without_pointer in self.TYPE_MAP:
-                            v_type = ('&'*ptr_count)  + self.TYPE_MAP[v_type_without_pointer]
+                        mapped_type = type_map_get(v_type_without_pointer)
+                        if mapped_type is not None:
+                            v_type = ('&'*ptr_count)  + mapped_type
                         else:
                             v_type = ('&'*ptr_count)  + v_type_without_pointer
             else:
@@ -1751,7 +1823,7 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         pdecl = v_name
         tdecl = v_type
 
-        if self.genOpts.alignFuncParam == 0:
+        if genOpts.alignFuncParam == 0:
             # Squeeze out multiple spaces - there is no indentation
             pdecl = ' '.join(pdecl.split())
             tdecl = ' '.join(tdecl.split())
@@ -1764,11 +1836,16 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         # self.indentFuncPointer
         # self.alignFuncParam
         n = len(params)
+        # makeVParamDecl renders a parameter either as declaration or as plain name, so render each form once.
+        # Its do_c_func_params and do_base_type flags don't change the result.
+        param_decls = [self.makeVParamDecl(v_name, p, genOpts.alignFuncParam, do_c_func_params=True, do_c_to_v_func_call_params=False, do_struct_members=False, keep_vk_member_name=False)
+                       for p in params]
+        param_names = [self.makeVParamDecl(v_name, p, genOpts.alignFuncParam, do_c_func_params=False, do_c_to_v_func_call_params=True).lstrip()
+                       for p in params]
         # fn C.vk ...
         if n > 0:
             c_func_def_params = '(\n'
-            for p in params:
-                cur_base_type = self.makeVParamDecl(v_name, p, self.genOpts.alignFuncParam, do_c_func_params=True, do_c_to_v_func_call_params=False, do_struct_members=False, do_base_type=False,  keep_vk_member_name=False)
+            for cur_base_type in param_decls:
                 c_func_def_params += '{}, '.format(cur_base_type)
             c_func_def_params = c_func_def_params.rstrip(', ')
             c_func_def_params += ')'
@@ -1776,11 +1853,12 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             c_func_def_params = '()'
             
         # pub type PFN_vkGet ...
-        v_wrapper = ''
+        # Collected in parts and joined once when returning
+        v_wrapper = []
         if n > 0:
             v_pub_type_pfn_param_names = '('
-            for p in params:
-                cur_type = self.makeVParamDecl(v_name, p, self.genOpts.alignFuncParam, do_c_func_params=True, do_c_to_v_func_call_params=False, do_struct_members=False, do_base_type=False, do_array_voidptr=False, keep_vk_member_name=False).lstrip()
+            for param_decl in param_decls:
+                cur_type = param_decl.lstrip()
                 v_pub_type_pfn_param_names += '{}, '.format(cur_type)
             v_pub_type_pfn_param_names = v_pub_type_pfn_param_names.rstrip(', ')
             v_pub_type_pfn_param_names += ')'
@@ -1790,26 +1868,22 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         # Add PFN_func type defintion for each vk function.
         # These are not part of vulkan, but of the bindings for V
         if v_type == 'PFN_vkVoidFunction':
-            v_wrapper += 'pub type PFN_{} = fn{} voidptr\n'.format(v_name_original,  v_pub_type_pfn_param_names) 
+            v_wrapper.append('pub type PFN_{} = fn{} voidptr\n'.format(v_name_original,  v_pub_type_pfn_param_names))
         else:
-            v_wrapper += 'pub type PFN_{} = fn{} {}\n'.format(v_name_original,  v_pub_type_pfn_param_names,  v_type) 
-
-
+            v_wrapper.append('pub type PFN_{} = fn{} {}\n'.format(v_name_original,  v_pub_type_pfn_param_names,  v_type))
         # pub fn get_ ...
         v_name_no_vk = self.removeVk(v_name)
-        v_wrapper += '@[inline]\npub fn '
-        v_wrapper += v_name_no_vk
-
+        v_wrapper.append('@[inline]\npub fn ')
+        v_wrapper.append(v_name_no_vk)
         # C function params to basetype for C call inside V function
         if n > 0:
             v_function_params_cast_base = '(\n'
-            for p in params:
-                cur_base_type = self.makeVParamDecl(v_name, p, self.genOpts.alignFuncParam, do_c_func_params=True, do_c_to_v_func_call_params=False, do_struct_members=False, do_base_type=True).lstrip()
+            for param_decl, cur_param_name in zip(param_decls, param_names):
+                cur_base_type = param_decl.lstrip()
                 its_an_array = False
                 if cur_base_type.startswith('['):
                     its_an_array = True
                 cur_base_type = self.v_translate_type_basetype(cur_base_type.lstrip())
-                cur_param_name = self.makeVParamDecl(v_name, p, self.genOpts.alignFuncParam, do_c_func_params=False, do_c_to_v_func_call_params=True).lstrip()
                 if its_an_array:
                     v_function_params_cast_base += '{}({}.data), '.format(cur_base_type,  cur_param_name)
                 else:
@@ -1819,13 +1893,11 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             v_function_params_cast_base += ')'
 
             v_function_param_names_and_types = '(\n'
-            v_function_param_names_and_types += ',\n'.join(self.makeVParamDecl(v_name, p, self.genOpts.alignFuncParam, do_c_func_params=False, do_c_to_v_func_call_params=False, do_array_voidptr=False).lstrip()
-                                            for p in params)
+            v_function_param_names_and_types += ',\n'.join(param_decl.lstrip() for param_decl in param_decls)
             v_function_param_names_and_types += ')'
             
             v_function_param_names = '(\n'
-            v_function_param_names += ',\n'.join(self.makeVParamDecl(v_name, p, self.genOpts.alignFuncParam, do_c_func_params=False, do_c_to_v_func_call_params=True).lstrip()
-                                            for p in params)
+            v_function_param_names += ',\n'.join(param_names)
             v_function_param_names += ')'
             
         else:
@@ -1840,75 +1912,73 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
         if v_type == 'PFN_vkVoidFunction':
             v_type = 'voidptr'
         # Append V function params
-        #v_wrapper += v_function_param_names_and_types + ' ' + v_type + " {\n"
-        v_wrapper += v_function_param_names_and_types + v_type + " {\n"
+        #v_wrapper.append(v_function_param_names_and_types + ' ' + v_type + " {\n")
+        v_wrapper.append(v_function_param_names_and_types + v_type + " {\n")
         v_type_stripped = v_type.strip()
+        # C call inside V function. Only functions without return type don't return the C result
+        if v_type_stripped == '':
+            c_call = '    C.' + v_name_original
+        else:
+            c_call = '    return C.' + v_name_original
+        # The call arguments on a single line
+        c_call += v_function_param_names.replace('\n', ' ')
 
-        is_protected, extension_names = self.getFeatureConditionalCompilation(v_name_original)
-        #TODO remove is_protected = False or remove the if branch in case the conditional compilation isn't needed
-        is_protected = False
+        #TODO set EMIT_CONDITIONAL_COMPILATION or remove the if branch in case the conditional compilation isn't needed
+        if self.EMIT_CONDITIONAL_COMPILATION:
+            is_protected, extension_names = self.getFeatureConditionalCompilation(v_name_original)
+        else:
+            is_protected, extension_names = False, []
         if is_protected:
+            last_extension_name = extension_names[-1]
             if len(extension_names) > 1:
-                v_wrapper += '//$if {} ?{{\n'.format(' && '.join(extension_names))
-                v_wrapper += '$if {} ?{{\n'.format(extension_names[len(extension_names)-1])
+                v_wrapper.append('//$if {} ?{{\n'.format(' && '.join(extension_names)))
+                v_wrapper.append('$if {} ?{{\n'.format(last_extension_name))
             else:
-                v_wrapper += '$if {} ?{{\n'.format(' && '.join(extension_names))
-
-            if v_type_stripped == '':
-                v_wrapper += '    C.' + v_name_original + '{}'.format(' '.join(v_function_param_names.split('\n')))
-            elif v_type_stripped == 'Result':
-                v_wrapper += '    return C.' + v_name_original + '{}'.format(' '.join(v_function_param_names.split('\n')))
-            else:
-                v_wrapper += '    return C.' + v_name_original + '{}'.format(' '.join(v_function_param_names.split('\n')))
-            v_wrapper += '} $else {'
-            if v_type_stripped == '':
-                v_wrapper += '    //NOTE: Please check for 0 in case {} compiler flag was not passed.\n'.format(extension_names[len(extension_names)-1])
-                v_wrapper += '    return'
-            elif v_type_stripped == 'Result':
-                v_wrapper += '    return Result.error_extension_not_present'
+                # Only one extension, so joining would just return it
+                v_wrapper.append('$if {} ?{{\n'.format(last_extension_name))
+            # Fallback, if the extension is not available
+            if v_type_stripped == 'Result':
+                fallback = '    return Result.error_extension_not_present'
             else:
-                v_wrapper += '    //NOTE: Please check for 0 in case {} compiler flag was not passed.\n'.format(extension_names[len(extension_names)-1])
-                v_wrapper += '    return ' + v_type + '(0)'
-            v_wrapper += '\n}}\n'
-            return ['fn C.' + v_name_original + c_func_def_params + ' ' + v_type + '\n' + v_wrapper, tdecl]
+                fallback = '    //NOTE: Please check for 0 in case {} compiler flag was not passed.\n'.format(last_extension_name)
+                if v_type_stripped == '':
+                    fallback += '    return'
+                else:
+                    fallback += '    return ' + v_type + '(0)'
+            v_wrapper.append(c_call + '} $else {' + fallback + '\n}}\n')
+            return ['fn C.' + v_name_original + c_func_def_params + ' ' + v_type + '\n' + ''.join(v_wrapper), tdecl]
         else:
-            # C call inside V function
-            if v_type_stripped == '': # has no return type
-                v_wrapper += '    C.' + v_name_original + '{}'.format(' '.join(v_function_param_names.split('\n')))
-            elif v_type_stripped == 'Result': # vk.Result return type
-                v_wrapper += '    return C.' + v_name_original + '{}'.format(' '.join(v_function_param_names.split('\n')))
-            else: # has any other return type
-                v_wrapper += '    return C.' + v_name_original + '{}'.format(' '.join(v_function_param_names.split('\n')))
-
-            v_wrapper += '\n}\n'
-            return ['@[keep_args_alive]\nfn C.' + v_name_original + c_func_def_params + ' ' + v_type + '\n' + v_wrapper, tdecl]
+            v_wrapper.append(c_call)
+            v_wrapper.append('\n}\n')
+            return ['@[keep_args_alive]\nfn C.' + v_name_original + c_func_def_params + ' ' + v_type + '\n' + ''.join(v_wrapper), tdecl]
 
     # Looks up if self.featureDictionary contains a given function name (or other item) under an extension.
-    # Returns the extension names under which the item was found.
-    def getFeatureConditionalCompilation(self,  item_str) -> (bool, [str]):
+    # Returns the extension names under which the item was found, each once and in registry order.
+    def getFeatureConditionalCompilation(self,  item_str) -> tuple[bool, list[str]]:
         # self.featureDictionary.keys
         # self.featureDictionary['VK_AMD_buffer_marker'].keys ==
         # basetype, bitmask, command, define, enum, enumconstant, funcpointer, handle, include, struct, uninion
         # self.featureDictionary['VK_AMD_buffer_marker']['command'].None[0] == 'vkCmdWriteBufferMarkerAMD'
-        ret_bool = False
-        ret_feature_names = []
-
-        for feature in self.featureDictionary.items():
-            featureName = feature[0]
-            # Only protect functions that need an extension, not a specific vulkan version
-            if featureName.startswith('VK_VERSION_'):
-                continue
-            for featureSection in feature[1].items():
-                featureSectionName = featureSection[0]
-                for featureSectionItem in featureSection[1].items():
-#                    print(featureName + ', ' + featureSectionName)
-#                    print(featureSectionItem[1])
-                    if featureSectionName == 'command' and item_str in featureSectionItem[1]:
-#                        print(featureName + ':\n' + featureSectionName)
-#                        print(featureSectionItem)
-                        ret_bool = True
-                        ret_feature_names.append(featureName)
-        return ret_bool, ret_feature_names
+        # Scanning every feature for every command is quadratic, so index all commands once.
+        # reg.py fills featureDictionary for all features before generation starts
+        if self.extensions_by_command is None:
+            extensions_by_command = {}
+            for featureName, featureSections in self.featureDictionary.items():
+                # Only protect functions that need an extension, not a specific vulkan version
+                if featureName.startswith('VK_VERSION_'):
+                    continue
+                commandSection = featureSections.get('command')
+                if not commandSection:
+                    continue
+                # A command can be required several times by one extension. List the extension only once,
+                # so there's no '$if A && A'
+                commandNames = dict.fromkeys(commandName for commandNames in commandSection.values() for commandName in commandNames)
+                for commandName in commandNames:
+                    extensions_by_command.setdefault(commandName, []).append(featureName)
+            self.extensions_by_command = extensions_by_command
+
+        ret_feature_names = list(self.extensions_by_command.get(item_str, ()))
+        return len(ret_feature_names) > 0, ret_feature_names
 
     # Note Anton: the oiginal method comes from vulkandocs/scripts/generator.py
     def genType(self, typeinfo, name, alias):
@@ -1926,12 +1996,15 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
             return
         c_section, c_body = cur_type
 
-        # Add text to REPLACEMENT_EXACT_TEXT_ARR if it contains something from REPLACEMENT_CONTAINS_ARR
+        # Add text to REPLACEMENT_EXACT_TEXTS if it contains something from REPLACEMENT_CONTAINS_ARR
         # Later used to find exactly matching C code and replace it with V code
-        esc_text = self.escStr(c_body)
-        for contains_str in self.REPLACEMENT_CONTAINS_ARR:
-            if contains_str in c_body:
-                self.REPLACEMENT_EXACT_TEXT_ARR.append(esc_text)
+        if self.REPLACEMENT_CONTAINS_REGEX.search(c_body):
+            # Only escaped if it is stored
+            esc_text = self.escStr(c_body)
+            for contains_str in self.REPLACEMENT_CONTAINS_ARR:
+                if contains_str in c_body:
+                    self.REPLACEMENT_EXACT_TEXTS[esc_text] = None
+                    break
 
         cur_type = self.genVType(typeinfo, name, alias)
         if cur_type is None or not cur_type:
@@ -1945,8 +2018,9 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
 
         v_section, v_body = cur_type
 
-        if c_body in self.REPLACEMENT_MAP:
-            body = self.REPLACEMENT_MAP[c_body]
+        # Single lookup, as c_body can be long. All REPLACEMENT_MAP values are strings
+        body = self.REPLACEMENT_MAP.get(c_body)
+        if body is not None:
             section = c_section
         else:
             body = v_body
@@ -1954,9 +2028,8 @@ REPLACEMENT_MAP = {{\n    {}\n}}".format(key_strings))
 
         # Convert '#define VK_HEADER_VERSION 123'
         # to          'pub const header_version = 123'
-        if c_body.startswith('// Version of this file\n#define VK_HEADER_VERSION '):
-            version_index = c_body.index('VK_HEADER_VERSION') + len('VK_HEADER_VERSION') + 1
-            body = 'pub const header_version = ' + c_body[version_index:-1]
+        if c_body.startswith(self.HEADER_VERSION_PREFIX):
+            body = 'pub const header_version = ' + c_body[len(self.HEADER_VERSION_PREFIX):-1]
         
         # Handle some of the version functions
         if '#define VK_MAKE_VERSION(major, minor, patch)' in c_body:
@@ -2030,6 +2103,9 @@ pub fn make_video_std_version(major u32, minor u32, patch u32) u32 {
 
     # NOTE Anton: If text contains `\` before new line, the mapping isn't found. This fixes it
     def escStr(self, text) -> str:
+        # Most texts contain no backslash, so there is nothing to replace
+        if '\\' not in text:
+            return text
         return text.replace(r'\\', '\\\\').replace(r'\n', '\\n')
 
     # Note Anton: the oiginal method comes from vulkandocs/scripts/generator.py
@@ -2057,16 +2133,12 @@ pub fn make_video_std_version(major u32, minor u32, patch u32) u32 {
         else:
             name = elem.get('name')
 
-        if reason == 'aliased':
-            return f'{padding}// {name} is a deprecated alias\n'
-        elif reason == 'ignored':
-            return f'{padding}// {name} is deprecated and should not be used\n'
-        elif reason == 'true':
-            return f'{padding}// {name} is deprecated, but no reason was given in the API XML\n'
-        else:
+        comment_format = self.DEPRECATION_COMMENT_FORMATS.get(reason)
+        if comment_format is None:
             # This can be caught by schema validation
             self.logMsg('error', f"{name} has an unknown deprecation attribute value '{reason}'")
             exit(1)
+        return comment_format.format(padding=padding, name=name)
 
     # Note Anton: the oiginal method comes from vulkandocs/scripts/generator.py
     def genRequirements(self, name, mustBeFound = True, indent = 0):